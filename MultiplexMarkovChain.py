@@ -8,6 +8,7 @@ handles only 4-state Markov chains (i.e. two layer networks).
 
 """
 from __future__ import division
+import math
 import numpy as np
 from warnings import warn
 
@@ -49,59 +50,124 @@ class MarkovChain(object):
 
     """
 
+    __slots__ = ("counts", "params", "std", "state_totals", "num_transitions", "_l")
+
     def __init__(self, counts):
-        counts = np.array(counts)
+        # no copy is made when counts is already an array
+        counts = np.asarray(counts)
         self.counts = counts
         self.params = None # probability of transitions
         self.std = None # std. associated with the transitions
         self.state_totals = None #total number of transitions leaving a state
         self.num_transitions = len(counts)
+        self._l = int(round(math.sqrt(self.num_transitions))) # number of states in the MC
 
-    def compute_prob_params(self,counts):
+    def compute_prob_params(self):
         """
-        Given counts returns the mean, std. dev. for every transition
-        and normalization constant for each state.
+        Computes the mean, std. dev. for every transition and
+        normalization constant for each state from the counts.
         """
-        num_transitions  = self.num_transitions
-        l = int(np.sqrt(num_transitions)) # number of states in the MC
-        totals = np.zeros(l)
-        mu = np.zeros(num_transitions)
-        sigma = np.zeros(num_transitions)
-        for c1 in range(l):
-            tot = np.sum(counts[list(range(c1*l, (c1+1)*l ))]) # total counts leaving this state
-            totals[c1] = tot
-            if tot > 0:
-                for c2 in range(l):
-                    index = c1*l + c2
-                    # mean and std. dev of the corresponding beta distribution
-                    p = (counts[index]+1)/(tot+l)
-                    mu[index] = p
-                    sigma[index] = np.sqrt(p*(1-p)/(tot+ (l+1)))
-
-        self.params = mu
-        self.std = sigma
+        l = self._l
+        # row c1 holds the counts of transitions leaving state c1
+        c = self.counts.reshape(l, l)
+        p, sigma, totals = _prob_params(c)
+
+        self.params = p.ravel()
+        self.std = sigma.ravel()
         self.state_totals = totals
 
 
-    def get_parameters(self):
+    @classmethod
+    def batch_compute_prob_params(cls, counts):
+        """
+        Computes the mean, std. dev. for every transition and the
+        normalization constant for each state of many Markov chains
+        at once, e.g., one for every time step.
+
+        Parameters
+        ----------
+        counts : array of shape (T, num_transitions) with the counts
+        of a Markov chain in each row.
+
+        Returns
+        -------
+        params, std : arrays of shape (T, num_transitions)
+
+        state_totals : array of shape (T, number of states)
+        """
+        counts = np.asarray(counts)
+        T, num_transitions = counts.shape
+        l = int(round(math.sqrt(num_transitions)))
+        p, sigma, totals = _prob_params(counts.reshape(T, l, l))
+        return p.reshape(T, num_transitions), sigma.reshape(T, num_transitions), totals
+
+
+    def _ensure_computed(self):
         if self.params is None:
-            self.compute_prob_params(self.counts)
+            self.compute_prob_params()
+
+    def get_parameters(self):
+        self._ensure_computed()
         return self.params
 
     def get_std_dev(self):
-        if self.std is None:
-            self.compute_prob_params(self.counts)
+        self._ensure_computed()
         return self.std
 
     def get_state_totals(self):
-        if self.state_totals is None:
-            self.compute_prob_params(self.counts)
+        self._ensure_computed()
         return self.state_totals
 
 
 
-def _is_power_of_2(x):
-    return (x & (x-1) == 0 and x != 0)
+def _prob_params(c):
+    """
+    Mean and std. dev. of the transition parameters and the state
+    totals for counts `c` whose last two axes are (from state, to
+    state). States without counts get zero mean and std. dev.
+    """
+    l = c.shape[-1]
+    totals = c.sum(axis=-1) # total counts leaving each state
+    mask = (totals > 0)[..., None]
+    tot = totals[..., None]
+    # mean and std. dev of the corresponding beta distributions
+    p = np.where(mask, (c+1)/(tot+l), 0.0)
+    sigma = np.where(mask, np.sqrt(p*(1-p)/(tot + (l+1))), 0.0)
+    return p, sigma, totals
+
+
+def _layer_counts(counts):
+    """
+    Counts of the two layers of the null model from the counts of a
+    4-state MC in the last axis of `counts`.
+    """
+    # The state of an edge is 2*(layer 2) + (layer 1), so the last axes
+    # of the reshaped counts are (previous layer 2, previous layer 1,
+    # current layer 2, current layer 1).
+    shape = counts.shape[:-1]
+    c = counts.reshape(shape + (2, 2, 2, 2))
+    counts_layer1 = c.sum(axis=(-4, -2)).reshape(shape + (4,))
+    counts_layer2 = c.sum(axis=(-3, -1)).reshape(shape + (4,))
+    return counts_layer1, counts_layer2
+
+
+# For each transition `i` of the 4-state MC, the indices of the
+# corresponding transitions of the 2-state MCs of layer 1 and layer 2.
+_NULL_INDEX_TABLE = np.array([[0, 0], [1, 0], [0, 1], [1, 1],
+                              [2, 0], [3, 0], [2, 1], [3, 1],
+                              [0, 2], [1, 2], [0, 3], [1, 3],
+                              [2, 2], [3, 2], [2, 3], [3, 3]], dtype=np.int64)
+# contiguous columns of the table for gathering the null components
+_NULL_INDEX_LAYER1 = np.ascontiguousarray(_NULL_INDEX_TABLE[:, 0])
+_NULL_INDEX_LAYER2 = np.ascontiguousarray(_NULL_INDEX_TABLE[:, 1])
+_NULL_INDEX_TABLE.flags.writeable = False
+_NULL_INDEX_LAYER1.flags.writeable = False
+_NULL_INDEX_LAYER2.flags.writeable = False
+
+
+def _is_power_of_4(x):
+    # a power of 2 whose only set bit is at an even position
+    return (x > 0 and x & (x-1) == 0 and x & 0x55555555 != 0)
 
 
 class MultiplexMarkovChain(MarkovChain):
@@ -121,6 +187,9 @@ class MultiplexMarkovChain(MarkovChain):
 
         MC : the MarkovChain initialized with the above counts.
 
+    The list is built from arrays with a row for each layer every time
+    the attribute is accessed, so changing the dictionaries or the
+    list has no effect on the model. The counts are read-only.
 
     null_prob : transition parameters for the null model.
 
@@ -133,15 +202,23 @@ class MultiplexMarkovChain(MarkovChain):
 
     """
 
+    __slots__ = ("_null_counts", "_null_params", "_null_std", "_null_chains",
+                 "null_prob", "null_std")
 
     def __init__(self, counts):
         num_transitions = len(counts)
-        #check if the num_transitions is a power of 2.
-        if not _is_power_of_2(num_transitions):
-            raise AssertionError("Length of counts is not a power of 2.")
+        #check if the num_transitions is a power of 4, i.e., the
+        #number of states is a power of 2.
+        if not _is_power_of_4(num_transitions):
+            raise AssertionError("Length of counts is not a power of 4.")
 
         MarkovChain.__init__(self, counts)
-        self.null_components = None
+        # counts, transition parameters and std. dev. of the null
+        # components, one row for each layer
+        self._null_counts = None
+        self._null_params = None
+        self._null_std = None
+        self._null_chains = None
         self.null_prob = None
         self.null_std = None
 
@@ -151,26 +228,54 @@ class MultiplexMarkovChain(MarkovChain):
         This function computes the counts for the null model. Currently
         hard coded for 4 states.
         """
-        counts_layer1 = np.zeros(4)
-        counts_layer2 = np.zeros(4)
-        counts_layer1[0] = counts[0] + counts[2] + counts[8] + counts[10]
-        counts_layer1[1] = counts[1] + counts[3] + counts[9] + counts[11]
-        counts_layer1[2] = counts[4] + counts[6] + counts[12] + counts[14]
-        counts_layer1[3] = counts[5] + counts[7] + counts[13] + counts[15]
-        counts_layer2[0] = counts[0] + counts[1] + counts[4] + counts[5]
-        counts_layer2[1] = counts[2] + counts[3] + counts[6] + counts[7]
-        counts_layer2[2] = counts[8] + counts[9] + counts[12] + counts[13]
-        counts_layer2[3] = counts[10] + counts[11] + counts[14] + counts[15]
-        self.null_components = [{"counts":counts_layer1}, {"counts":counts_layer2}]
+        self._null_counts = np.array(_layer_counts(np.asarray(counts)))
+        self._null_counts.setflags(write=False)
+        self._null_params = None
+        self._null_std = None
+        self._null_chains = None
+
+    @classmethod
+    def batch_compute_null_counts(cls, counts):
+        """
+        Computes the counts for the null model of many 4-state Markov
+        chains at once.
+
+        Parameters
+        ----------
+        counts : array of shape (T, 16) with the counts of a Markov
+        chain in each row.
+
+        Returns
+        -------
+        counts_layer1, counts_layer2 : arrays of shape (T, 4) with the
+        counts of the two layers. Use
+        `MarkovChain.batch_compute_prob_params` to get their parameters.
+        """
+        return _layer_counts(np.asarray(counts))
+
+    @property
+    def null_components(self):
+        if self._null_counts is None:
+            return None
+        components = [{"counts":c} for c in self._null_counts]
+        if self._null_params is not None:
+            if self._null_chains is None:
+                self._null_chains = [MarkovChain(c) for c in self._null_counts]
+            for component, chain in zip(components, self._null_chains):
+                component["MC"] = chain
+        return components
 
     def compute_prob_null_components(self):
         """
-        Initializes a MarkovChain for each layer of the multiplex that
-        describes the evolution of edges on that layer independent of
-        the other layers.
+        Computes the transition parameters of the Markov chain for each
+        layer of the multiplex that describes the evolution of edges on
+        that layer independent of the other layers.
         """
-        for component in self.null_components:
-            component["MC"] = MarkovChain(component["counts"])
+        num_layers, num_transitions = self._null_counts.shape
+        l = int(round(math.sqrt(num_transitions)))
+        p, sigma, _ = _prob_params(self._null_counts.reshape(num_layers, l, l))
+        self._null_params = p.reshape(num_layers, num_transitions)
+        self._null_std = sigma.reshape(num_layers, num_transitions)
 
 
     def compute_null_components(self):
@@ -182,38 +287,11 @@ class MultiplexMarkovChain(MarkovChain):
         self.compute_prob_null_components()
 
     def get_index_for_null(self, i):
-        if (i == 0):
-            return [0, 0]
-        elif (i == 1):
-            return [1, 0]
-        elif (i == 2):
-            return [0, 1]
-        elif (i == 3):
-            return [1, 1]
-        elif (i == 4):
-            return [2, 0]
-        elif (i == 5):
-            return [3, 0]
-        elif (i == 6):
-            return [2, 1]
-        elif (i == 7):
-            return [3, 1]
-        elif (i == 8):
-            return [0, 2]
-        elif (i == 9):
-            return [1, 2]
-        elif (i == 10):
-            return [0, 3]
-        elif (i == 11):
-            return [1, 3]
-        elif (i == 12):
-            return [2, 2]
-        elif (i == 13):
-            return [3, 2]
-        elif (i == 14):
-            return [2, 3]
-        else:
-            return [3, 3]
+        """
+        Returns the indices of the transitions of the two null
+        components that together make up the `i`th transition.
+        """
+        return _NULL_INDEX_TABLE[i].tolist()
 
 
     def compute_null_prob_std(self):
@@ -222,23 +300,16 @@ class MultiplexMarkovChain(MarkovChain):
         computing the standard deviation the method approximates the
         beta distributions as a Gaussian distributions.
         """
-        num_transitions = self.num_transitions
-        pnull = np.ones(num_transitions)
-        std_null = np.zeros(num_transitions)
         #If the Gaussian approximation is not justified warn the user
         state_totals = self.get_state_totals()
-        if (np.any(state_totals < 100)):
+        if (state_totals.min() < 100):
             warn("Some of the state totals are less than 100. Gaussian approximation may not be justified.")
-        for i in range(num_transitions):
-            indices = self.get_index_for_null(i)
-            for j,q in enumerate(indices):
-                null_component = self.null_components[j]
-                prob = null_component["MC"].get_parameters()[q]
-                sigma = null_component["MC"].get_std_dev()[q]
-                pnull[i] *= prob
-                std_null[i] +=  (sigma/prob)**2
-        std_null = np.sqrt(std_null)
-        std_null = pnull*std_null
+        i1, i2 = _NULL_INDEX_LAYER1, _NULL_INDEX_LAYER2
+        p1, p2 = self._null_params
+        # squared relative errors of each component, gathered once
+        r1, r2 = (self._null_std/self._null_params)**2
+        pnull = p1[i1]*p2[i2]
+        std_null = pnull*np.sqrt(r1[i1] + r2[i2])
         self.null_prob = pnull
         self.null_std = std_null
 
@@ -250,7 +321,7 @@ class MultiplexMarkovChain(MarkovChain):
         function is called.
         """
         if self.null_prob is None:
-            if self.null_components is None:
+            if self._null_params is None:
                 self.compute_null_components()
 
             self.compute_null_prob_std()
@@ -263,7 +334,7 @@ class MultiplexMarkovChain(MarkovChain):
         distribution of the transition parameters of the null model.
         """
         if self.null_std is None:
-            if self.null_components is None:
+            if self._null_params is None:
                 self.compute_null_components()
             self.compute_null_prob_std()
         return self.null_std
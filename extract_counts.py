@@ -5,8 +5,9 @@ chains for the dynamics of edges on a two-layer multiplex network.
 """
 
 
+import csv
 import numpy as np
-import networkx as nx
+from scipy.sparse import csr_matrix
 import logging
 
 #set up logs
@@ -26,11 +27,13 @@ def get_node_set(g1,g2,method="union"):
     transitions of the Markov chains.  The input for the keyword
     argument `method` controls the method used.
     """
+    return list(_combine_nodes(g1.nodes(), g2.nodes(), method))
+
+
+def _combine_nodes(nodes1, nodes2, method="union"):
     if (method=="intersection"):
-        nodes = list(set(g1.nodes()) & set(g2.nodes()))
-    else:
-        nodes = list(set(g1.nodes()) | set(g2.nodes()))
-    return nodes
+        return set(nodes1).intersection(nodes2)
+    return set(nodes1).union(nodes2)
     
 
 def get_counts(g1, g2, method):
@@ -58,21 +61,97 @@ def get_counts(g1, g2, method):
     """
     # get the set of nodes to iterate over
     nodes = get_node_set(g1, g2, method)
-    # Now count the numbers for each transition
-    counts = np.zeros(16, int)
-    for i,n in enumerate(nodes):
-        for m in nodes[i+1:]:
-            if (g1.has_edge(n,m)):
-                #An edge is present, check what is the state
-                prev_state = g1.edge[n][m]["state"]
-            else:
-                prev_state = 0
-            if (g2.has_edge(n,m)):
-                current_state = g2.edge[n][m]["state"]
-            else:
-                current_state = 0
-            transition = prev_state*4 + current_state
-            counts[transition] += 1
+    idx = dict((n, i) for i, n in enumerate(nodes))
+    # Reading the states from the edge view is one pass over the edges
+    # of each graph, and about twice as fast as exporting them with
+    # nx.to_scipy_sparse_array, which also iterates over the edges in
+    # Python.
+    e1 = _edge_array(g1.edges(data="state"), idx)
+    e2 = _edge_array(g2.edges(data="state"), idx)
+    return _count_transitions(e1, e2, len(nodes))
+
+
+def get_counts_from_edges(nodes1, edges1, nodes2, edges2, method="union", idx=None):
+    """
+    Computes the counts for each transition from time (t) step to time
+    (t+1) given the nodes and edges present at the two time steps.
+    Same as `get_counts` without building networkx graphs.
+
+    Parameters
+    -----------
+    nodes1, nodes2 : iterables of the nodes at time t and (t+1)
+
+    edges1, edges2 : dictionaries mapping a pair of nodes (node1,
+    node2) to the state of the edge between them at time t and (t+1).
+    When both (node1, node2) and (node2, node1) are present, the one
+    that comes later in the dictionary is used.
+
+    method : When the set of nodes at time t is not the same as at
+    (t+1), the `method` to be used to find a common set of
+    nodes. Accepts two values union or intersection.
+
+    idx : optional, dictionary mapping every node to a distinct integer
+    index. Can be reused across time steps to avoid building it for
+    every call.
+
+    Returns
+    -------
+    counts : np.array of counts for the transitions
+
+    """
+    nodes = _combine_nodes(nodes1, nodes2, method)
+    if idx is None:
+        idx = dict((n, i) for i, n in enumerate(nodes))
+    e1 = _edge_array(((n, m, state) for (n, m), state in edges1.items()), idx, nodes)
+    e2 = _edge_array(((n, m, state) for (n, m), state in edges2.items()), idx, nodes)
+    return _count_transitions(e1, e2, len(nodes), len(idx))
+
+
+def _edge_array(edges, idx, nodes=None):
+    """
+    Returns an array with a row (index of node1, index of node2,
+    state) for every edge (node1, node2, state) in `edges` between
+    nodes in `nodes`. By default `nodes` are all the nodes in `idx`.
+    """
+    if nodes is None:
+        nodes = idx
+    edges = [(idx[n], idx[m], state) for n, m, state in edges
+             if n in nodes and m in nodes]
+    return np.array(edges, np.int32).reshape(-1, 3)
+
+
+def _state_matrix(edges, N):
+    """
+    Returns a sparse N x N matrix with the state of the edge between
+    every pair of nodes (i, j) with i < j. Pairs not in `edges` are in
+    state 0.
+    """
+    i, j = edges[:, 0], edges[:, 1]
+    keep = i != j
+    rows = np.minimum(i, j)[keep]
+    cols = np.maximum(i, j)[keep]
+    states = edges[keep, 2]
+    # csr_matrix sums duplicate entries, keep the last state of a pair
+    # instead, as adding the edges to a graph would.
+    _, last = np.unique((rows.astype(np.int64)*N + cols)[::-1], return_index=True)
+    last = len(rows) - 1 - last
+    # states are in [0, 3] and transitions in [0, 15], so int8 suffices
+    return csr_matrix((states[last].astype(np.int8), (rows[last], cols[last])), shape=(N, N))
+
+
+def _count_transitions(e1, e2, N, size=None):
+    """
+    Returns the counts of the transitions between the edges `e1` at
+    time t and the edges `e2` at time (t+1) among N nodes. Every
+    unordered pair of nodes is counted once. `size` is the number of
+    node indices when it is larger than N.
+    """
+    if size is None:
+        size = N
+    transitions = 4*_state_matrix(e1, size) + _state_matrix(e2, size)
+    counts = np.bincount(transitions.data, minlength=16)
+    # pairs without an edge at both time steps are not stored
+    counts[0] += N*(N-1)//2 - transitions.nnz
     return counts
 
 
@@ -117,7 +196,8 @@ def compute_counts_from_file(fname_edges, fname_nodes=None, method=None):
     
     """
     fEdges = open(fname_edges,"r")
-    fEdges.readline()
+    edgeRows = csv.reader(fEdges)
+    next(edgeRows, None)
     counts = {}
     prevTimeStep = None
     timeStepToProcess = None
@@ -133,24 +213,20 @@ def compute_counts_from_file(fname_edges, fname_nodes=None, method=None):
 
     if (fname_nodes is not None):
         fNodes = open(fname_nodes,"r")
-        fNodes.readline()
-        nodeLine = fNodes.readline()
-        nodeLine = nodeLine.rstrip()
-        if (nodeLine):
-            timeStep_nodes, node = nodeLine.split(",")
-        else:
-            nodeLine = None
-
-    # Networkx graph objects initialized in the loop. Used to track
-    # edges
-    g_old = None
-    g_new = None
-            
-    for line in fEdges:
-        line = line.rstrip()
-        edge = line.split(",")
+        nodeRows = csv.reader(fNodes)
+        next(nodeRows, None)
+        nodeRow = next(nodeRows, None)
+
+    # Nodes and edges of the previous and the current time step. Edges
+    # are stored as a dictionary from a pair of nodes to the state.
+    time_old = nodes_old = edges_old = None
+    time_new = nodes_new = edges_new = None
+    # Index of every node seen so far, shared by all time steps.
+    idx = {}
+
+    for edge in edgeRows:
         if (len(edge) != 5):
-            logger.warning("Line not in proper format. Ignoring %s",line)
+            logger.warning("Line not in proper format. Ignoring %s",",".join(edge))
             continue
         timeStep, n1, n2, eA, eB = edge
         if (timeStep != prevTimeStep):
@@ -158,43 +234,44 @@ def compute_counts_from_file(fname_edges, fname_nodes=None, method=None):
                 if (timeStepToProcess is None):
                     timeStepToProcess = prevTimeStep
                 else:
-                    # There are two graphs that are built. Get counts for them.
-                    logger.info("Getting counts for %s-->%s",g_old.graph['time'],g_new.graph['time'])
-                    c = get_counts(g_old, g_new, method = method)
+                    # There are two time steps that are read. Get counts for them.
+                    logger.info("Getting counts for %s-->%s",time_old,time_new)
+                    c = get_counts_from_edges(nodes_old, edges_old, nodes_new, edges_new, method, idx)
                     counts[timeStepToProcess] = c
                     timeStepToProcess = prevTimeStep
-                #New time step has started. Assign old graphs to the new ones.
-                g_old = g_new
-                # Start building a new graph for the current time.
-            g_new = nx.Graph(time=timeStep)
+                #New time step has started. Assign old time step to the new one.
+                time_old, nodes_old, edges_old = time_new, nodes_new, edges_new
+                # Start collecting the nodes and edges for the current time.
+            time_new, nodes_new, edges_new = timeStep, set(), {}
             #add nodes for this timeStep
             if fname_nodes is not None:
-                while (nodeLine and timeStep_nodes == timeStep):
-                    g_new.add_node(node)
-                    nodeLine = fNodes.readline()
-                    nodeLine = nodeLine.rstrip()
-                    if (nodeLine):
-                        timeStep_nodes, node = nodeLine.split(",")
-                    else:
-                        nodeLine = None
+                while (nodeRow and nodeRow[0] == timeStep):
+                    nodes_new.add(nodeRow[1])
+                    idx.setdefault(nodeRow[1], len(idx))
+                    nodeRow = next(nodeRows, None)
+            prevTimeStep = timeStep
 
         #another edge in the graph, process and store the state
         # assuming inputs are "nice"
-        g_new.add_nodes_from([n1,n2])
+        nodes_new.add(n1)
+        nodes_new.add(n2)
+        idx.setdefault(n1, len(idx))
+        idx.setdefault(n2, len(idx))
         try:
             edgeState = 2*int(eB) + int(eA)
-        except:
-            logger.error("Edge '%s' cannot produce an integer valued state. Please check the input.", line)
-        if (g_new.has_edge(n1,n2) and g_new.edge[n1][n2]["state"] != edgeState):
-            logger.warning("Graph already has edge %s--%s in state %s",n1,n2,g_new.edge[n1][n2]["state"])
-        g_new.add_edge(n1,n2, state=edgeState)
-        prevTimeStep = timeStep
+        except ValueError:
+            logger.error("Edge '%s' cannot produce an integer valued state. Please check the input.", ",".join(edge))
+            continue
+        pair = (n1, n2) if n1 <= n2 else (n2, n1)
+        if (pair in edges_new and edges_new[pair] != edgeState):
+            logger.warning("Graph already has edge %s--%s in state %s",n1,n2,edges_new[pair])
+        edges_new[pair] = edgeState
 
     logger.info("Reached end of edge list")
-    logger.info("Getting counts for %s-->%s",g_old.graph['time'],g_new.graph['time'])
-    c = get_counts(g_old, g_new, method)
+    logger.info("Getting counts for %s-->%s",time_old,time_new)
+    c = get_counts_from_edges(nodes_old, edges_old, nodes_new, edges_new, method, idx)
     counts[timeStepToProcess] = c
     fEdges.close()
+    if (fname_nodes is not None):
+        fNodes.close()
     return counts
-
-
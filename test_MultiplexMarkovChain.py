@@ -39,6 +39,21 @@ class TestMarkovChain(unittest.TestCase):
         self.assertTrue(np.allclose(sigma_expected, sigma_obtained))
 
 
+    def test_markov_chain_state_with_no_counts(self):
+        MC = MultiplexMarkovChain.MarkovChain([0, 0, 20, 20])
+        self.assertTrue(np.allclose(MC.get_state_totals(), [0, 40]))
+        self.assertTrue(np.allclose(MC.get_parameters()[:2], [0, 0]))
+        self.assertTrue(np.allclose(MC.get_std_dev()[:2], [0, 0]))
+
+
+    def test_markov_chain_non_integer_counts(self):
+        MC = MultiplexMarkovChain.MarkovChain([0.5, 1.5, 2.5, 3.5])
+        parameters_expected = np.array([0.375, 0.625, 0.4375, 0.5625])
+        self.assertTrue(np.allclose(parameters_expected, MC.get_parameters()))
+        params, _, _ = MultiplexMarkovChain.MarkovChain.batch_compute_prob_params([[0.5, 1.5, 2.5, 3.5]])
+        self.assertTrue(np.allclose(parameters_expected, params[0]))
+
+
 class TestMultiplexMarkovChain(unittest.TestCase):
 
     def get_counts_for_exception(self):
@@ -58,6 +73,8 @@ class TestMultiplexMarkovChain(unittest.TestCase):
         counts = self.get_counts_for_exception()
         with self.assertRaises(AssertionError):
             MultiplexMarkovChain.MultiplexMarkovChain(counts)
+        with self.assertRaises(AssertionError):
+            MultiplexMarkovChain.MultiplexMarkovChain(np.ones(8))
 
     def test_counts_null_components(self):
         self.MC.compute_null_components()
@@ -79,6 +96,37 @@ class TestMultiplexMarkovChain(unittest.TestCase):
             self.assertTrue(np.allclose(layer["MC"].get_parameters(),prob_expected[i]))
 
 
+    def test_null_components_are_not_modifiable(self):
+        self.MC.compute_null_components()
+        null_components = self.MC.null_components
+        self.assertIs(null_components[0]["MC"], self.MC.null_components[0]["MC"])
+        with self.assertRaises(ValueError):
+            null_components[0]["counts"][0] = 999
+        null_components[0]["counts"] = np.zeros(4)
+        self.assertTrue(np.allclose(self.MC.null_components[0]["counts"], [521238, 1295, 317, 40340]))
+
+
+    def test_index_for_null(self):
+        indices = self.MC.get_index_for_null(3)
+        self.assertEqual(indices, [1, 1])
+        indices[0] = 9
+        self.assertEqual(self.MC.get_index_for_null(3), [1, 1])
+
+
+    def test_batch_matches_single_chains(self):
+        counts = np.array([self.get_counts(), np.arange(16), np.zeros(16, int)])
+        params, std, totals = MultiplexMarkovChain.MarkovChain.batch_compute_prob_params(counts)
+        layer1, layer2 = MultiplexMarkovChain.MultiplexMarkovChain.batch_compute_null_counts(counts)
+        for t, c in enumerate(counts):
+            MC = MultiplexMarkovChain.MultiplexMarkovChain(c)
+            self.assertTrue(np.allclose(params[t], MC.get_parameters()))
+            self.assertTrue(np.allclose(std[t], MC.get_std_dev()))
+            self.assertTrue(np.allclose(totals[t], MC.get_state_totals()))
+            MC.compute_null_components()
+            self.assertTrue(np.allclose(layer1[t], MC.null_components[0]["counts"]))
+            self.assertTrue(np.allclose(layer2[t], MC.null_components[1]["counts"]))
+
+
     def test_prob_null(self):
         pnull_expected = [0.93845799054089529, 0.002333366374620856, 0.059061792822898439, 0.00014685026158533105, 0.0073580671314871036, 0.93343328978402906, 0.00046307947811962514, 0.058745563606364147, 0.088106968510195949, 0.00021906770442966462, 0.90941281485359782, 0.0022611489317765224, 0.00069081087868002027, 0.087635225335945602, 0.0071303357309267087, 0.90454362805444766]
         pnull_obtained = self.MC.get_null_prob()
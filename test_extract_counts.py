@@ -7,8 +7,11 @@ from extract_counts import *
 
 
 
+import os
+import tempfile
 import unittest
 import numpy as np
+import networkx as nx
 
 class TestExtractCounts(unittest.TestCase):
 
@@ -42,6 +45,63 @@ class TestExtractCounts(unittest.TestCase):
         for key in counts_expected:
             np.testing.assert_array_equal(counts_expected[key], counts_obtained[key])
 
+    def test_counts_with_bad_first_row_of_time_step(self):
+        """
+        A row with a non-integer edge type is ignored, also when it is
+        the first row of a time step.
+        """
+        with open("test_input_edges.csv") as f:
+            lines = f.readlines()
+        lines.insert(lines.index("1,A,B,1,1\n"), "1,A,B,x,0\n")
+        fd, fname = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(fd, "w") as f:
+            f.writelines(lines)
+        try:
+            counts_obtained = compute_counts_from_file(fname)
+        finally:
+            os.remove(fname)
+        counts_expected = compute_counts_from_file("test_input_edges.csv")
+        for key in counts_expected:
+            np.testing.assert_array_equal(counts_expected[key], counts_obtained[key])
+
+
+    def test_counts_from_graphs(self):
+        g1 = nx.Graph()
+        g1.add_nodes_from(["C", "D"])
+        g1.add_edge("A", "B", state=3)
+        g1.add_edge("B", "C", state=1)
+        g1.add_edge("A", "A", state=1)
+        g2 = nx.Graph()
+        g2.add_edge("A", "B", state=3)
+        g2.add_edge("C", "A", state=2)
+        counts_expected = np.array([0,0,1,0,1,0,0,0,0,0,0,0,0,0,0,1],int)
+        np.testing.assert_array_equal(counts_expected, get_counts(g1, g2, "intersection"))
+        counts_expected[0] = 3
+        np.testing.assert_array_equal(counts_expected, get_counts(g1, g2, "union"))
+
+
+    def test_counts_from_edges(self):
+        nodes1 = ["A", "B", "C", "D"]
+        edges1 = {("A", "B"): 3, ("B", "C"): 1}
+        nodes2 = ["A", "B", "C"]
+        edges2 = {("A", "B"): 3, ("A", "C"): 2}
+        counts_expected = np.array([0,0,1,0,1,0,0,0,0,0,0,0,0,0,0,1],int)
+        counts_obtained = get_counts_from_edges(nodes1, edges1, nodes2, edges2, "intersection")
+        np.testing.assert_array_equal(counts_expected, counts_obtained)
+        counts_expected[0] = 3
+        counts_obtained = get_counts_from_edges(nodes1, edges1, nodes2, edges2, "union")
+        np.testing.assert_array_equal(counts_expected, counts_obtained)
+
+
+    def test_counts_from_edges_with_both_orders_of_a_pair(self):
+        nodes = ["A", "B"]
+        edges1 = {("A", "B"): 1, ("B", "A"): 2}
+        edges2 = {("B", "A"): 2}
+        counts_expected = np.zeros(16, int)
+        counts_expected[10] = 1
+        counts_obtained = get_counts_from_edges(nodes, edges1, nodes, edges2)
+        np.testing.assert_array_equal(counts_expected, counts_obtained)
+
 
 if __name__ == '__main__':
     unittest.main()